@@ -12,8 +12,57 @@
 
 # Import necessary libraries
 import pandas as pd
+import numpy as np
 import glob
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Month column headers from the CPI files, in calendar order
+MONTH_ORDER = [
+    '24-Jan', '24-Feb', '24-Mar', '24-Apr', '24-May', '24-Jun',
+    '24-Jul', '24-Aug', '24-Sep', '24-Oct', '24-Nov', '24-Dec'
+]
+
+# Parquet cache of the combined CPI data, written next to the CPI files.
+# Bump CPI_CACHE_VERSION whenever load_all_cpi_data's output changes, so older caches are ignored.
+CPI_CACHE_VERSION = 2
+CPI_CACHE_FILENAME = f'.cpi_cache.v{CPI_CACHE_VERSION}.parquet'
+
+# Method to warn about missing CPI values, whether the data was freshly parsed or read from the cache
+def _warn_missing_cpi(df):
+    if df['CPI'].isnull().any():
+        print("WARNING: Some CPI values are missing or not numeric. They have been treated as missing (NaN).")
+
+# Method to load a single CPI file and transform it to long format
+def _load_cpi_file(filepath):
+    """
+    Reads one jurisdiction's CPI file and reshapes it from "wide" to "long" format.
+
+    Args:
+        filepath (str): Path to a CPI file (e.g., "./cpi_data/AB.CPI.1810000401.csv")
+
+    Returns:
+        pandas.DataFrame: The long-format data with columns [Item, Month, Jurisdiction, CPI].
+    """
+    # The pyarrow engine parses with Arrow's multithreaded C++ CSV reader
+    df_wide = pd.read_csv(filepath, engine='pyarrow')
+    
+    # Extract Jurisdiction from filename (e.g., "AB.CPI.1810000401.csv" -> "AB")
+    filename = os.path.basename(filepath)
+    jurisdiction_name = filename.split('.')[0]
+    
+    # Transform from wide to long with NumPy instead of pd.melt. Rows come out in the same
+    # order as melt: every item for the first month, then every item for the next month, etc.
+    # Columns are built directly in the assignment's [Item, Month, Jurisdiction, CPI] order.
+    month_columns = df_wide.columns[1:]
+    n_items, n_months = len(df_wide), len(month_columns)
+    df_long = pd.DataFrame({
+        'Item': np.tile(df_wide['Item'].to_numpy(), n_months),
+        'Month': np.repeat(month_columns.to_numpy(), n_items),
+        'Jurisdiction': jurisdiction_name,
+        'CPI': df_wide[month_columns].to_numpy().ravel(order='F')
+    })
+    return df_long
 
 # Method to load and combine all CPI data files
 def load_all_cpi_data(path_pattern):
@@ -21,8 +70,13 @@ def load_all_cpi_data(path_pattern):
     Loads and combines all 11 CPI data files into a single DataFrame.
     
     This function demonstrates file I/O using pandas (L6) and concatenation (L6).
-    It also performs a critical data manipulation (pd.melt) to transform
+    It also performs a critical data manipulation (a NumPy reshape in place of pd.melt) to transform
     the data from its "wide" format to the "long" format required for analysis.
+
+    The combined DataFrame is cached as a Parquet file in the CPI folder. Later runs read the
+    cache instead of re-parsing the CSV files, as long as it is newer than every CPI file and
+    covers the same jurisdictions. The cache filename carries a version tag, so a cache written
+    by an older version of this loader is never reused.
     
     Args:
         path_pattern (str): A glob pattern to find the 11 CPI files 
@@ -45,33 +99,48 @@ def load_all_cpi_data(path_pattern):
     # 2. The filename itself, to keep the rest alphabetical.
     all_files_sorted = sorted(all_files, key=lambda f: ('Canada' not in os.path.basename(f), os.path.basename(f)))
 
-    # List to hold individual DataFrames
-    dataframe_list = []
+    # Reuse the cached combined DataFrame if it is still valid
+    cache_path = os.path.join(os.path.dirname(all_files_sorted[0]), CPI_CACHE_FILENAME)
+    jurisdictions = {os.path.basename(f).split('.')[0] for f in all_files}
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) > max(os.path.getmtime(f) for f in all_files):
+        try:
+            cached_df = pd.read_parquet(cache_path)
+            if set(cached_df['Jurisdiction'].unique()) == jurisdictions:
+                print(f"Found {len(all_files)} files. Loading cached data from '{cache_path}'...")
+                _warn_missing_cpi(cached_df)
+                return cached_df
+        except Exception as e:
+            print(f"WARNING: Could not read the CPI cache '{cache_path}': {e}. Re-reading the CSV files.")
+
     print(f"Found {len(all_files)} files. Processing...")
     
-    # Process each file and transform
-    for filepath in all_files_sorted:
-        df_wide = pd.read_csv(filepath)
-        
-        # Extract Jurisdiction from filename (e.g., "AB.CPI.1810000401.csv" -> "AB")
-        filename = os.path.basename(filepath)
-        jurisdiction_name = filename.split('.')[0]
-        
-        # Transform from wide to long using pd.melt
-        df_long = pd.melt(df_wide, 
-                          id_vars=['Item'], 
-                          var_name='Month', 
-                          value_name='CPI')
-        
-        # Add the new 'Jurisdiction' column
-        df_long['Jurisdiction'] = jurisdiction_name
-        dataframe_list.append(df_long)
+    # Read and transform each file in parallel; pd.read_csv releases the GIL while parsing.
+    # ex.map returns results in input order, so 'Canada' stays first.
+    max_workers = min(len(all_files), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        dataframe_list = list(ex.map(_load_cpi_file, all_files_sorted))
 
-    # Combine all DataFrames into one (L6 - pd.concat)
+    # Combine all DataFrames into one (L6 - pd.concat); columns are already in assignment order
     master_df = pd.concat(dataframe_list, ignore_index=True)
-    
-    # Reorder columns to assignment spec and return
-    return master_df[['Item', 'Month', 'Jurisdiction', 'CPI']]
+
+    # Store the repeated labels as categoricals so filters, groupbys and merges work on integer codes
+    for column in ('Item', 'Month', 'Jurisdiction'):
+        master_df[column] = master_df[column].astype('category')
+
+    # Make sure CPI is numeric (a stray text cell would otherwise turn the whole column into strings).
+    # CPI stays float64: float32 cannot hold one-decimal values like 158.3 exactly, which shows up in
+    # the printed tables and shifts the 2-decimal Equivalent_Salary results by a cent.
+    master_df['CPI'] = pd.to_numeric(master_df['CPI'], errors='coerce')
+    # Rows are kept with a NaN CPI so later calculations skip them, as they would for any missing value.
+    _warn_missing_cpi(master_df)
+
+    # Cache the combined DataFrame so later runs can skip parsing the CSV files
+    try:
+        master_df.to_parquet(cache_path, compression='zstd')
+    except Exception as e:
+        print(f"WARNING: Could not write the CPI cache '{cache_path}': {e}")
+
+    return master_df
 
 # Method to calculate month-to-month changes
 def calculate_mtm_changes(df):
@@ -89,41 +158,40 @@ def calculate_mtm_changes(df):
     items_needed = ['Food', 'Shelter', 'All-items excluding food and energy']
     filtered_df = df[df['Item'].isin(items_needed)].copy() 
     
-    # 2. Map months to sortable numbers
-    month_map = {
-        '24-Jan': 1, '24-Feb': 2, '24-Mar': 3, '24-Apr': 4,
-        '24-May': 5, '24-Jun': 6, '24-Jul': 7, '24-Aug': 8,
-        '24-Sep': 9, '24-Oct': 10, '24-Nov': 11, '24-Dec': 12
-    }
-    filtered_df['Month_Num'] = filtered_df['Month'].map(month_map)
+    # 2. Make months an ordered categorical so they sort in calendar order
+    filtered_df['Month'] = pd.Categorical(filtered_df['Month'], categories=MONTH_ORDER, ordered=True)
 
-    # Handle any potential nulls
-    if filtered_df['Month_Num'].isnull().any():
-        print("WARNING: Some month names in CSV headers did not match the map. Check data.")
-        filtered_df = filtered_df.dropna(subset=['Month_Num'])
+    # Handle any potential nulls (month names not in MONTH_ORDER)
+    if filtered_df['Month'].isnull().any():
+        print("WARNING: Some month names in CSV headers did not match the expected months. Check data.")
+        filtered_df = filtered_df.dropna(subset=['Month'])
 
     # 3. Sort by Jurisdiction, Item, and then Month
-    filtered_df.sort_values(by=['Jurisdiction', 'Item', 'Month_Num'], inplace=True)
-    
-    # 4. Calculate pct_change() within each group
-    filtered_df['MtM_Change'] = filtered_df.groupby(['Jurisdiction', 'Item'])['CPI'].pct_change()
-    
-    # 5. Aggregate to get average month-to-month change
-    avg_changes_series = filtered_df.groupby(['Jurisdiction', 'Item'])['MtM_Change'].mean()
+    filtered_df.sort_values(by=['Jurisdiction', 'Item', 'Month'], inplace=True)
+    
+    # 4. Calculate the change from the previous row in one NumPy pass, then blank out the
+    #    first month of each (Jurisdiction, Item) group, matching a per-group pct_change()
+    cpi = filtered_df['CPI'].to_numpy(dtype=float)
+    mtm_change = np.full_like(cpi, np.nan)
+    mtm_change[1:] = (cpi[1:] - cpi[:-1]) / cpi[:-1]
+    jurisdictions = filtered_df['Jurisdiction'].to_numpy()
+    items = filtered_df['Item'].to_numpy()
+    group_start = (jurisdictions[1:] != jurisdictions[:-1]) | (items[1:] != items[:-1])
+    mtm_change[1:][group_start] = np.nan
+    filtered_df['MtM_Change'] = mtm_change
+    
+    # 5. Aggregate straight into a named column of a flat DataFrame (no reset_index/rename needed)
+    avg_changes_df = filtered_df.groupby(['Jurisdiction', 'Item'], observed=True, as_index=False).agg(
+        Avg_MtM_Change_Percent=('MtM_Change', 'mean')
+    )
     
     # 6. Format to percent, rounded to 1 decimal
-    formatted_series = (avg_changes_series * 100).round(1)
-    
-    # 7. Convert the Series to a clean DataFrame
-    avg_changes_df = formatted_series.reset_index()
-    
-    # 8. Rename the calculated column for clarity
-    avg_changes_df.rename(columns={'MtM_Change': 'Avg_MtM_Change_Percent'}, inplace=True)
+    avg_changes_df['Avg_MtM_Change_Percent'] = (avg_changes_df['Avg_MtM_Change_Percent'] * 100).round(1)
 
     return avg_changes_df
 
 # Method to calculate equivalent salaries
-def calculate_equivalent_salaries(df, base_jurisdiction='ON', base_salary=100000):
+def calculate_equivalent_salaries(df, base_jurisdiction='ON', base_salary=100000, cpi_dec=None):
     """
     Calculates equivalent salary based on Dec-24 'All-items' CPI. (Q5)
     
@@ -133,21 +201,21 @@ def calculate_equivalent_salaries(df, base_jurisdiction='ON', base_salary=100000
         df (pandas.DataFrame): The master CPI DataFrame.
         base_jurisdiction (str): The jurisdiction to use as the baseline. ('ON' for Ontario)
         base_salary (int): The baseline salary.
+        cpi_dec (pandas.DataFrame, optional): Pre-filtered Dec-24 rows of df, to skip rescanning df.
 
     Returns:
         pandas.DataFrame: A DataFrame with salaries, indexed by Jurisdiction.
     """
     # 1. Filter for Dec-24, All-items CPI
-    cpi_dec_all_items = df[
-        (df['Item'] == 'All-items') & (df['Month'] == '24-Dec')
-    ].copy()
+    if cpi_dec is None:
+        cpi_dec = df[df['Month'] == '24-Dec']
+    cpi_dec_all_items = cpi_dec[cpi_dec['Item'] == 'All-items'].copy()
     
-    # 2. Get base CPI
+    # 2. Get base CPI from a Jurisdiction -> CPI lookup instead of masking the whole frame
+    cpi_by_jurisdiction = dict(zip(cpi_dec_all_items['Jurisdiction'], cpi_dec_all_items['CPI']))
     try:
-        base_cpi = cpi_dec_all_items.loc[
-            cpi_dec_all_items['Jurisdiction'] == base_jurisdiction, 'CPI'
-        ].values[0]
-    except IndexError:
+        base_cpi = cpi_by_jurisdiction[base_jurisdiction]
+    except KeyError:
         print(f"ERROR: Base jurisdiction '{base_jurisdiction}' not found in Dec-24 data.")
         return pd.DataFrame()
 
@@ -160,7 +228,7 @@ def calculate_equivalent_salaries(df, base_jurisdiction='ON', base_salary=100000
     return cpi_dec_all_items[['CPI', 'Equivalent_Salary']].round(2)
 
 # Method to analyze minimum wages
-def analyze_minimum_wages(cpi_data_df, wages_filepath):
+def analyze_minimum_wages(cpi_data_df, wages_filepath, cpi_dec=None):
     """
     Analyzes nominal vs. real minimum wages. (Q6)
     
@@ -170,6 +238,7 @@ def analyze_minimum_wages(cpi_data_df, wages_filepath):
     Args:
         cpi_data_df (pandas.DataFrame): The master CPI DataFrame.
         wages_filepath (str): Path to 'MinimumWages.csv'.
+        cpi_dec (pandas.DataFrame, optional): Pre-filtered Dec-24 rows of cpi_data_df, to skip rescanning it.
 
     Returns:
         tuple: (nominal_max, nominal_min, real_max, real_wage_df)
@@ -184,14 +253,15 @@ def analyze_minimum_wages(cpi_data_df, wages_filepath):
         print(f"An error occurred reading '{wages_filepath}': {e}. Skipping Q6.")
         return None, None, None, pd.DataFrame()
 
-    # 2. Nominal analysis (finding max/min row)
-    nominal_max = wages_df.loc[wages_df['Minimum Wage'].idxmax()]
-    nominal_min = wages_df.loc[wages_df['Minimum Wage'].idxmin()]
+    # 2. Nominal analysis (finding max/min row by position)
+    wages = wages_df['Minimum Wage'].to_numpy()
+    nominal_max = wages_df.iloc[int(np.nanargmax(wages))]
+    nominal_min = wages_df.iloc[int(np.nanargmin(wages))]
     
     # 3. Get Dec-24 'All-items' CPI data for merging
-    cpi_dec_all_items = cpi_data_df[
-        (cpi_data_df['Item'] == 'All-items') & (cpi_data_df['Month'] == '24-Dec')
-    ]
+    if cpi_dec is None:
+        cpi_dec = cpi_data_df[cpi_data_df['Month'] == '24-Dec']
+    cpi_dec_all_items = cpi_dec[cpi_dec['Item'] == 'All-items']
     
     # 4. Merge (L6 - pd.merge)
     # We rename 'Province' to 'Jurisdiction' to match the CPI data
@@ -203,32 +273,34 @@ def analyze_minimum_wages(cpi_data_df, wages_filepath):
     merged_df['Real_Wage_Index'] = (merged_df['Minimum Wage'] / merged_df['CPI']) * 100
     
     # 6. Find max real wage
-    real_max = merged_df.loc[merged_df['Real_Wage_Index'].idxmax()]
+    real_max = merged_df.iloc[int(np.nanargmax(merged_df['Real_Wage_Index'].to_numpy()))]
     
     return nominal_max, nominal_min, real_max, merged_df.set_index('Jurisdiction')
 
 # Method to calculate annual inflation for 'Services'
-def calculate_annual_service_inflation(df):
+def calculate_annual_service_inflation(df, cpi_jan_dec=None):
     """
     Computes the annual change in CPI for 'Services'. (Q7)
     
-    Demonstrates filtering and using pivot_table for clean calculation.
+    Demonstrates filtering and reshaping with unstack for clean calculation.
     
     Args:
         df (pandas.DataFrame): The master CPI DataFrame.
+        cpi_jan_dec (pandas.DataFrame, optional): Pre-filtered Jan-24 and Dec-24 rows of df, to skip rescanning df.
 
     Returns:
         pandas.DataFrame: A DataFrame with Jan/Dec CPI and % change.
     """
     # 1. Filter
-    services_df = df[
-        (df['Item'] == 'Services') & 
-        (df['Month'].isin(['24-Jan', '24-Dec']))
-    ]
+    if cpi_jan_dec is None:
+        cpi_jan_dec = df[df['Month'].isin(['24-Jan', '24-Dec'])]
+    services_df = cpi_jan_dec[cpi_jan_dec['Item'] == 'Services']
     
     # 2. Pivot the table (adjacent concept to L6 groupby)
+    # There is one row per (Jurisdiction, Month), so unstack reshapes without pivot_table's aggregation.
     # This creates columns '24-Jan' and '24-Dec'
-    pivot_df = services_df.pivot_table(index='Jurisdiction', columns='Month', values='CPI')
+    # sort_index keeps the rows in alphabetical Jurisdiction order, as pivot_table returned them
+    pivot_df = services_df.set_index(['Jurisdiction', 'Month'])['CPI'].unstack('Month').sort_index()
     
     # 3. Calculate annual change
     pivot_df['Annual_Change_Pct'] = (
@@ -262,6 +334,10 @@ def main(cpi_path_pattern, wages_filepath):
     # Confirm load
     print(f"Successfully loaded and combined {len(master_cpi_df)} rows from {len(master_cpi_df['Jurisdiction'].unique())} files.\n")
 
+    # Filter the Jan-24/Dec-24 rows once; the Q5, Q6 and Q7 calculations reuse these slices
+    cpi_jan_dec = master_cpi_df[master_cpi_df['Month'].isin(['24-Jan', '24-Dec'])]
+    cpi_dec = cpi_jan_dec[cpi_jan_dec['Month'] == '24-Dec']
+
     # Display outputs for each question
     print("="*80)
     print("--- Master DataFrame ---")
@@ -292,7 +368,7 @@ def main(cpi_path_pattern, wages_filepath):
     try:
         # 1. Group by 'Item', then find the index (row label) of the
         #    row with the maximum 'Avg_MtM_Change_Percent' in each group.
-        idx_highest_per_item = mtm_changes.groupby('Item')['Avg_MtM_Change_Percent'].idxmax()
+        idx_highest_per_item = mtm_changes.groupby('Item', observed=True)['Avg_MtM_Change_Percent'].idxmax()
         
         # 2. Use .loc[] to select the complete rows from the original
         #    DataFrame using the indices we just found.
@@ -313,7 +389,7 @@ def main(cpi_path_pattern, wages_filepath):
     print("="*80)
     print("--- Equivalent Salary to $100k in Ontario ---")
     print("="*80)
-    salaries_df = calculate_equivalent_salaries(master_cpi_df)
+    salaries_df = calculate_equivalent_salaries(master_cpi_df, cpi_dec=cpi_dec)
     print(salaries_df)
     print("\n")
 
@@ -324,7 +400,7 @@ def main(cpi_path_pattern, wages_filepath):
     
     # Analyze Minimum Wages and Real Wages
     # Handle case where wages file might be missing
-    nom_max, nom_min, real_max, real_wage_df = analyze_minimum_wages(master_cpi_df, wages_filepath)
+    nom_max, nom_min, real_max, real_wage_df = analyze_minimum_wages(master_cpi_df, wages_filepath, cpi_dec=cpi_dec)
     if not real_wage_df.empty:
         print("--- Highest Nominal Wage ---")
         print(nom_max)
@@ -340,7 +416,7 @@ def main(cpi_path_pattern, wages_filepath):
     print("="*80)
     print("--- Annual Inflation for 'Services' ---")
     print("="*80)
-    service_inflation_df = calculate_annual_service_inflation(master_cpi_df)
+    service_inflation_df = calculate_annual_service_inflation(master_cpi_df, cpi_jan_dec=cpi_jan_dec)
     print(service_inflation_df)
     print("\n")
 
@@ -8,8 +8,22 @@
 #==========================================================================================
 
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg') # Non-interactive backend; the plot is only saved to file, never shown
 import matplotlib.pyplot as plt
 import numpy as np
+from functools import lru_cache
+
+# Amounts below half a cent are rounding residue, not money still owing
+ROUNDING_TOLERANCE = 0.005
+
+# Present value of 1 per period over n periods at the periodic rate. Cached since the same
+# (rate, n) pairs recur across payment schemes and mortgage scenarios.
+@lru_cache(maxsize=None)
+def _annuity_factor(rate, n):
+    if rate == 0:
+        return n
+    return (1-(1+rate)**-n)/rate
 
 class MortgagePayment: 
 
@@ -53,10 +67,7 @@ class MortgagePayment:
 
     def calculate_payment(self, principal, rate, m):
         n = self.amortization_years * m
-        if rate == 0:
-            return principal/n
-        payment = (principal * rate)/(1-(1+rate)**-n)
-        return payment
+        return principal / _annuity_factor(rate, n)
 
     # Method to compute all payment schemes for a given principal, returning them as a tuple
 
@@ -83,47 +94,75 @@ class MortgagePayment:
         Returns:
             pd.DataFrame: A DataFrame containing the amortization schedule.
         """ 
+        return self.build_amortization_schedules(principal, [payment], [rate], [periods_per_year])[0]
 
-        total_periods = self.amortization_years * periods_per_year
-        data = []
-        current_balance = principal
+    # Method to build amortization schedules for several payment schemes in one vectorized pass
+
+    def build_amortization_schedules (self, principal, payments, rates, periods_per_year):
+        """
+        Builds amortization schedules for several payment schemes sharing the same principal.
 
-        # Loop through each payment period to create the payment schedule
+        All schemes are computed together as one (schemes x periods) matrix, padded to the
+        longest schedule, and then sliced into one DataFrame per scheme.
+
+        Arguments:
+            principal (float): The initial loan amount.
+            payments (list of float): The periodic payment amount for each scheme.
+            rates (list of float): The periodic interest rate for each scheme.
+            periods_per_year (list of int): Number of payments per year for each scheme.
+        Returns:
+            list of pd.DataFrame: The amortization schedule for each scheme, in input order.
+        """
+        payments = np.asarray(payments, dtype=float)
+        rates = np.asarray(rates, dtype=float)
+        total_periods = self.amortization_years * np.asarray(periods_per_year)
+        periods = np.arange(1, total_periods.max() + 1)
 
-        for period in np.arange (1, total_periods + 2):
+        # Closed-form balance at the start of each period, for every scheme and period at once:
+        # B(t-1) = B0*(1+r)^(t-1) - P*((1+r)^(t-1)-1)/r, or B0 - P*(t-1) when r is zero
+        growth = np.power.outer(1 + rates, periods - 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            annuity = np.where(rates[:, None] == 0, periods - 1, (growth - 1) / rates[:, None])
+        beginning_balance = principal * growth - payments[:, None] * annuity
+        interest_paid = beginning_balance * rates[:, None]
 
-            if current_balance <= 0:
-                break
+        # Final payment scenario: the first period where the balance plus interest is covered by the payment,
+        # allowing for rounding residue (e.g. a 166.666...67 balance against a 166.666...66 payment).
+        # Otherwise the schedule stops at the scheme's last scheduled period with the balance still owing.
+        pays_off = beginning_balance + interest_paid < payments[:, None] + ROUNDING_TOLERANCE
+        cleared = pays_off | (periods >= total_periods[:, None])
+        num_periods = cleared.argmax(axis=1) + 1
+        paid_off = pays_off[np.arange(len(num_periods)), num_periods - 1]
 
-            interest_paid = current_balance * rate
+        # Created as a private helper since it is only used to assemble each scheme's DataFrame
+        def _scheme_schedule(i):
+            n = num_periods[i]
 
-            # Final payment scenario to avoid negative balance
-            if (current_balance + interest_paid) < payment:
-                final_payment = current_balance + interest_paid
-                principal_paid = current_balance
-                ending_balance = 0
+            # Preallocate one block for the five money columns and fill each column in place.
+            # Fortran order keeps every column contiguous, so the DataFrame can wrap it without a copy.
+            block = np.empty((n, 5), order='F')
+            scheme_balance, scheme_payments, principal_paid, scheme_interest, ending_balance = block.T
 
-            # Regular payment scenario 
-            else:
-                final_payment = payment
-                principal_paid = payment - interest_paid
-                ending_balance = current_balance - principal_paid
+            # Clip the tail past this scheme's final payment
+            scheme_balance[:] = beginning_balance[i, :n]
+            scheme_interest[:] = interest_paid[i, :n]
 
-            # Append the period's data to the schedule
-            data.append({
-                "Period": period,
-                "Beginning Balance": current_balance,
-                "Payment": final_payment,
-                "Principal Paid": principal_paid,
-                "Interest Paid": interest_paid,
-                "Ending Balance": ending_balance
-            })
+            # Regular payments, with the final payment reduced to whatever is left owing if the loan is paid off
+            scheme_payments[:] = payments[i]
+            if paid_off[i]:
+                scheme_payments[-1] = scheme_balance[-1] + scheme_interest[-1]
+            np.subtract(scheme_payments, scheme_interest, out=principal_paid)
+            np.subtract(scheme_balance, principal_paid, out=ending_balance)
+            if paid_off[i]:
+                ending_balance[-1] = 0
+            np.round(block, 2, out=block)
 
-            current_balance = ending_balance
+            # Wrap the block in the schedule DataFrame in one shot
+            df = pd.DataFrame(block, columns=["Beginning Balance", "Payment", "Principal Paid", "Interest Paid", "Ending Balance"], copy=False)
+            df.insert(0, "Period", periods[:n])
+            return df
 
-            # Convert the schedule data into a DataFrame for easier handling       
-        df = pd.DataFrame(data)
-        return df[["Period", "Beginning Balance", "Payment", "Principal Paid", "Interest Paid", "Ending Balance"]].round(2)
+        return [_scheme_schedule(i) for i in range(len(num_periods))]
      
     # Method to generate Excel files and save amortization schedules and plot loan balance decline
 
@@ -135,12 +174,8 @@ class MortgagePayment:
 
         # Get payment values for all schemes
         payment_values = self.payments(principal)
-        (monthly_pmt, semi_monthly_pmt, bi_weekly_pmt, accelerated_bi_weekly_pmt, weekly_pmt, accelerated_weekly_pmt) = payment_values
+        (monthly_pmt, semi_monthly_pmt, bi_weekly_pmt, acc_bi_weekly_pmt, weekly_pmt, acc_weekly_pmt) = payment_values
 
-        # Calculate accelerated payments based on monthly payment
-        acc_bi_weekly_pmt = monthly_pmt / 2
-        acc_weekly_pmt = monthly_pmt / 4
-        
         # Build amortization schedules for each payment scheme and store in a dictionary  
         schemes = [ {'name': 'Monthly', 'payment': monthly_pmt, 'rate': self.monthly_rate, 'periods_per_year': 12},
             {'name': 'Semi-Monthly', 'payment': semi_monthly_pmt, 'rate': self.semi_monthly_rate, 'periods_per_year': 24},
@@ -151,42 +186,50 @@ class MortgagePayment:
         ]
         schedules = {}
 
-        # Generate schedules and save to Excel
-        for scheme in schemes:
-            # Generate the amortization schedule DataFrame and store it in the dictionary
-            df = self.build_amortization_schedule(principal, scheme['payment'], scheme['rate'], scheme['periods_per_year'])
+        # Generate the amortization schedule DataFrames for all schemes in one pass and store them in the dictionary
+        schedule_list = self.build_amortization_schedules(principal,
+                                                          [scheme['payment'] for scheme in schemes],
+                                                          [scheme['rate'] for scheme in schemes],
+                                                          [scheme['periods_per_year'] for scheme in schemes])
+        for scheme, df in zip(schemes, schedule_list):
             schedules[scheme['name']] = df
             print(f"\nAmortization Schedule for {scheme['name']} Payment Scheme:")
             
-            # Iterates through the 'schedules' dictionary, writing each DataFrame to a separate sheet in "Amortization_Schedules.xlsx".  
-            excel_filename = "Amortization_Schedules.xlsx"
-            print(f"\nSaving all amortization schedules to '{excel_filename}'...")
-            with pd.ExcelWriter(excel_filename) as writer:
-                for name, schedule_df in schedules.items():
-                    schedule_df.to_excel(writer, sheet_name=name, index=False)
-                print("Amortization schedules saved successfully.")
-
-            # Generate and save the loan balance decline plot
-            plot_filename = "Loan_Balance_Decline.png"
-            print(f"\nGenerating and saving loan balance decline plot to '{plot_filename}'..." )
-            plt.figure(figsize=(10, 6))
-
-            # Plot each payment scheme's loan balance decline
-            for name, df in schedules.items():
-                plt.plot(df['Period'], df['Ending Balance'], label=name, lw=2)
-            plt.title('Loan Balance Decline Over Time by Payment Scheme')
-            plt.xlabel('Payment Periods',fontsize=12)
-            plt.ylabel('Loan Balance ($)', fontsize=12)  
-            plt.legend(fontsize=10)
-            plt.grid(True, linestyle = '--', alpha=0.7)
-            ax = plt.gca()
-            ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:,.0f}'))
+        # Iterates through the 'schedules' dictionary, writing each DataFrame to a separate sheet in "Amortization_Schedules.xlsx".  
+        # The workbook is opened once, after all schedules are built; xlsxwriter is the faster engine for write-only output.
+        # Each column is written with a single write_column call rather than through to_excel's cell-by-cell formatter.
+        excel_filename = "Amortization_Schedules.xlsx"
+        print(f"\nSaving all amortization schedules to '{excel_filename}'...")
+        with pd.ExcelWriter(excel_filename, engine="xlsxwriter") as writer:
+            for name, schedule_df in schedules.items():
+                worksheet = writer.book.add_worksheet(name)
+                worksheet.write_row(0, 0, schedule_df.columns)
+                for col, column_name in enumerate(schedule_df.columns):
+                    worksheet.write_column(1, col, schedule_df[column_name].tolist())
+            print("Amortization schedules saved successfully.")
+
+        # Generate and save the loan balance decline plot
+        plot_filename = "Loan_Balance_Decline.png"
+        print(f"\nGenerating and saving loan balance decline plot to '{plot_filename}'..." )
+        fig = plt.figure(figsize=(10, 6))
+
+        # Plot each payment scheme's loan balance decline
+        for name, df in schedules.items():
+            plt.plot(df['Period'], df['Ending Balance'], label=name, lw=2, rasterized=True)
+        plt.title('Loan Balance Decline Over Time by Payment Scheme')
+        plt.xlabel('Payment Periods',fontsize=12)
+        plt.ylabel('Loan Balance ($)', fontsize=12)  
+        plt.legend(fontsize=10)
+        plt.grid(True, linestyle = '--', alpha=0.7)
+        ax = plt.gca()
+        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:,.0f}'))
+    
+        plt.tight_layout() # Ensures all labels fit
         
-            plt.tight_layout() # Ensures all labels fit
-            
-            # Save the figure
-            plt.savefig(plot_filename)
-            print("...Plot saved successfully.")
+        # Save the figure
+        plt.savefig(plot_filename)
+        plt.close(fig) # Release the figure's memory now that it is saved
+        print("...Plot saved successfully.")
 
 #==========================================================================================
 # Main Execution Block
@@ -216,4 +259,4 @@ if __name__ == "__main__":
     print(f"Rapid Bi-Weekly Payment:  ${payment_values[3]:.2f}")
     print(f"Rapid Weekly Payment:  ${payment_values[5]:.2f}")
     print(f"\n--- Schedule & Plot Generation (Assignment 2) ---")
-    mortgage_scenario.generate_payment_schedule(principal_amount)
\ No newline at end of file
+    mortgage_scenario.generate_payment_schedule(principal_amount)
\ No newline at end of file